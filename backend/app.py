@@ -3,6 +3,8 @@ from flask_cors import CORS
 import joblib
 import numpy as np
 import os
+import json
+from concurrent.futures import ThreadPoolExecutor
 import google.generativeai as genai
 from dotenv import load_dotenv
 
@@ -51,6 +53,27 @@ except Exception as e:
     print(f"❌ Error loading models: {e}")
     ml_model = scaler = label_encoder = None
 
+# Upper bound on cases per Gemini prompt; larger batches overrun the output-token limit
+MAX_GEMINI_BATCH_SIZE = 25
+
+# Upper bound on cases accepted by a single /api/predict-batch request
+MAX_BATCH_CASES = 500
+
+# Number of cases packed into a single Gemini prompt for batch explanations
+try:
+    GEMINI_BATCH_SIZE = max(1, int(os.getenv('GEMINI_BATCH_SIZE', '20')))
+except ValueError:
+    print("⚠️ Invalid GEMINI_BATCH_SIZE, using default of 20")
+    GEMINI_BATCH_SIZE = 20
+GEMINI_BATCH_SIZE = min(GEMINI_BATCH_SIZE, MAX_GEMINI_BATCH_SIZE)
+
+# Number of batch prompts sent to Gemini concurrently within one request
+try:
+    GEMINI_CONCURRENCY = max(1, int(os.getenv('GEMINI_CONCURRENCY', '5')))
+except ValueError:
+    print("⚠️ Invalid GEMINI_CONCURRENCY, using default of 5")
+    GEMINI_CONCURRENCY = 5
+
 # Feature names for the form
 FEATURE_NAMES = [
     "M1 Length",
@@ -134,18 +157,7 @@ def predict():
         probabilities = ml_model.predict_proba(input_scaled)[0]
         
         # Get gender label
-        gender = label_encoder.inverse_transform([prediction])[0]
-        confidence = max(probabilities) * 100
-        
-        prediction_result = {
-            'gender': gender,
-            'gender_full': 'Male' if gender == 'M' else 'Female',
-            'confidence': round(confidence, 2),
-            'probabilities': {
-                'Female': round(probabilities[0] * 100, 2),
-                'Male': round(probabilities[1] * 100, 2)
-            }
-        }
+        prediction_result = build_prediction_result(prediction, probabilities)
         
         # Generate AI explanation
         ai_explanation = generate_ai_explanation(measurements, prediction_result, FEATURE_NAMES)
@@ -168,6 +180,102 @@ def predict():
             'error': f'Prediction error: {str(e)}'
         }), 500
 
+@app.route('/api/predict-batch', methods=['POST'])
+def predict_batch():
+    """Predict gender for multiple cases with batched AI explanations"""
+    try:
+        if not all([ml_model, scaler, label_encoder]):
+            return jsonify({
+                'success': False,
+                'error': 'Models not loaded properly'
+            }), 500
+        
+        # Get JSON data
+        data = request.get_json()
+        
+        if not data or 'cases' not in data:
+            return jsonify({
+                'success': False,
+                'error': 'Missing cases in request body'
+            }), 400
+        
+        cases = data['cases']
+        
+        if not isinstance(cases, list) or not cases:
+            return jsonify({
+                'success': False,
+                'error': 'Cases must be a non-empty list of measurement lists'
+            }), 400
+        
+        if len(cases) > MAX_BATCH_CASES:
+            return jsonify({
+                'success': False,
+                'error': f'Too many cases: got {len(cases)}, maximum is {MAX_BATCH_CASES}'
+            }), 400
+        
+        # Validate every case before running the model
+        all_measurements = []
+        for index, measurements in enumerate(cases):
+            if not isinstance(measurements, list) or len(measurements) != 15:
+                count = len(measurements) if isinstance(measurements, list) else 0
+                return jsonify({
+                    'success': False,
+                    'error': f'Case {index}: expected 15 measurements, got {count}'
+                }), 400
+            try:
+                all_measurements.append([float(x) for x in measurements])
+            except (ValueError, TypeError):
+                return jsonify({
+                    'success': False,
+                    'error': f'Case {index}: all measurements must be valid numbers'
+                }), 400
+        
+        # Scale and predict all cases in one pass
+        input_scaled = scaler.transform(np.array(all_measurements))
+        predictions = ml_model.predict(input_scaled)
+        probabilities = ml_model.predict_proba(input_scaled)
+        
+        prediction_results = [
+            build_prediction_result(prediction, probs)
+            for prediction, probs in zip(predictions, probabilities)
+        ]
+        
+        # Generate AI explanations in chunked batch prompts
+        chunk_size = data.get('batch_size', GEMINI_BATCH_SIZE)
+        try:
+            chunk_size = min(max(1, int(chunk_size)), MAX_GEMINI_BATCH_SIZE)
+        except (ValueError, TypeError):
+            chunk_size = GEMINI_BATCH_SIZE
+        
+        ai_explanations = generate_ai_explanations_batch(
+            all_measurements, prediction_results, FEATURE_NAMES, chunk_size
+        )
+        
+        results = [
+            {
+                'prediction': prediction_result,
+                'ai_explanation': ai_explanation,
+                'input': {
+                    'measurements': measurements
+                }
+            }
+            for measurements, prediction_result, ai_explanation
+            in zip(all_measurements, prediction_results, ai_explanations)
+        ]
+        
+        return jsonify({
+            'success': True,
+            'count': len(results),
+            'results': results,
+            'feature_names': FEATURE_NAMES
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Batch prediction error: {str(e)}'
+        }), 500
+
 @app.route('/api/sample', methods=['GET'])
 def get_sample_data():
     """Get sample data for testing"""
@@ -203,12 +311,27 @@ def test_gemini():
             'api_key_present': bool(os.getenv('GEMINI_API_KEY'))
         })
 
+def build_prediction_result(prediction, probabilities):
+    """Format a single model prediction for the API response"""
+    gender = label_encoder.inverse_transform([prediction])[0]
+    confidence = max(probabilities) * 100
+    
+    return {
+        'gender': gender,
+        'gender_full': 'Male' if gender == 'M' else 'Female',
+        'confidence': round(confidence, 2),
+        'probabilities': {
+            'Female': round(probabilities[0] * 100, 2),
+            'Male': round(probabilities[1] * 100, 2)
+        }
+    }
+
 def generate_ai_explanation(measurements, prediction_result, feature_names):
     """Generate AI explanation using Gemini"""
     try:
         if not gemini_model:
             print("⚠️ Gemini model not available")
-            return f"AI analysis unavailable (Gemini not configured). The model predicted {prediction_result['gender_full']} based on the mandibular measurements provided, with {prediction_result['confidence']}% confidence."
+            return build_unconfigured_explanation(prediction_result)
         
         # Create a concise prompt for Gemini
         prompt = f"""Provide a brief forensic analysis (3-4 sentences max) explaining why the AI predicted {prediction_result['gender_full']} with {prediction_result['confidence']}% confidence.
@@ -238,7 +361,15 @@ Keep it concise and professional - maximum 4 sentences total."""
             print("🤖 Model Issue: The specified Gemini model was not found")
         
         # Provide a concise fallback explanation
-        fallback = f"""**MetricMind AI Analysis**
+        return build_fallback_explanation(prediction_result)
+
+def build_unconfigured_explanation(prediction_result):
+    """Build the short explanation used when Gemini is not configured"""
+    return f"AI analysis unavailable (Gemini not configured). The model predicted {prediction_result['gender_full']} based on the mandibular measurements provided, with {prediction_result['confidence']}% confidence."
+
+def build_fallback_explanation(prediction_result):
+    """Build the static explanation used when Gemini cannot answer"""
+    return f"""**MetricMind AI Analysis**
 
 The model predicted **{prediction_result['gender_full']}** with **{prediction_result['confidence']}% confidence** based on mandibular morphometric analysis.
 
@@ -250,8 +381,110 @@ The model predicted **{prediction_result['gender_full']}** with **{prediction_re
 **Method:** Logistic Regression trained on 156 forensic samples (75% accuracy)
 
 *Advanced AI analysis temporarily unavailable.*"""
-        
-        return fallback
+
+def build_batch_prompt(cases):
+    """Pack several (case_id, measurements, prediction_result) cases into one prompt"""
+    case_lines = []
+    for case_id, measurements, prediction_result in cases:
+        case_lines.append(
+            f"- id {case_id}: predicted {prediction_result['gender_full']} "
+            f"({prediction_result['confidence']}% confidence); "
+            f"Mandibular length {measurements[0]}mm, Bicondylar breadth {measurements[1]}mm, "
+            f"Bigonial breadth {measurements[3]}mm, Gonial angle {measurements[8]}°"
+        )
+    
+    return f"""You are assisting with forensic sex estimation from mandibular measurements.
+For EACH case below, provide a brief forensic analysis (3-4 sentences max) explaining why the AI predicted the given sex with the given confidence.
+
+For each case explain in simple terms:
+1. Which 2-3 measurements most indicate the predicted sex?
+2. Why is the confidence at the stated level?
+
+Cases:
+{chr(10).join(case_lines)}
+
+Respond ONLY with a JSON array, one object per case, in this exact format:
+[{{"id": <case id>, "explanation": "<analysis>"}}]
+Do not include any text outside the JSON array."""
+
+def parse_batch_response(text):
+    """Parse a batched Gemini response into a {case_id: explanation} dict"""
+    # Decode the first JSON array in the text, ignoring any code fences or
+    # prose the model wraps around it (before or after)
+    decoder = json.JSONDecoder()
+    items = None
+    start = text.find('[')
+    while start != -1:
+        try:
+            items, _ = decoder.raw_decode(text, start)
+        except json.JSONDecodeError:
+            items = None
+        if isinstance(items, list) and any(isinstance(item, dict) for item in items):
+            break
+        items = None
+        start = text.find('[', start + 1)
+    
+    explanations = {}
+    if not isinstance(items, list):
+        return explanations
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        explanation = item.get('explanation')
+        raw_id = item.get('id')
+        # Only exact integer ids; floats, booleans and other garbled ids get the fallback
+        if isinstance(raw_id, int) and not isinstance(raw_id, bool):
+            case_id = raw_id
+        elif isinstance(raw_id, str) and raw_id.strip().isdigit():
+            case_id = int(raw_id.strip())
+        else:
+            continue
+        if isinstance(explanation, str) and explanation.strip():
+            explanations[case_id] = explanation.strip()
+    return explanations
+
+def generate_ai_explanations_batch(measurements_list, prediction_results, feature_names, chunk_size=GEMINI_BATCH_SIZE):
+    """Generate AI explanations for many cases using one Gemini call per chunk"""
+    if not gemini_model:
+        print("⚠️ Gemini model not available")
+        return [build_unconfigured_explanation(prediction_result) for prediction_result in prediction_results]
+    
+    chunks = [
+        [
+            (case_id, measurements_list[case_id], prediction_results[case_id])
+            for case_id in range(start, min(start + chunk_size, len(prediction_results)))
+        ]
+        for start in range(0, len(prediction_results), chunk_size)
+    ]
+    
+    # Chunks are independent prompts, so send them to Gemini concurrently
+    with ThreadPoolExecutor(max_workers=min(GEMINI_CONCURRENCY, len(chunks))) as executor:
+        parsed_chunks = list(executor.map(explain_chunk, chunks))
+    
+    explanations = [None] * len(prediction_results)
+    for chunk, parsed in zip(chunks, parsed_chunks):
+        # Cases the model skipped or garbled get the per-case fallback
+        for case_id, _, prediction_result in chunk:
+            explanations[case_id] = parsed.get(case_id) or build_fallback_explanation(prediction_result)
+    
+    return explanations
+
+def explain_chunk(chunk):
+    """Send one batch prompt to Gemini and return the {case_id: explanation} answers for its cases"""
+    try:
+        print(f"🤖 Generating AI explanations for cases {chunk[0][0]}-{chunk[-1][0]}...")
+        response = gemini_model.generate_content(build_batch_prompt(chunk))
+        chunk_ids = {case_id for case_id, _, _ in chunk}
+        parsed = {
+            case_id: explanation
+            for case_id, explanation in parse_batch_response(response.text).items()
+            if case_id in chunk_ids
+        }
+        print(f"✅ Received {len(parsed)}/{len(chunk)} AI explanations")
+        return parsed
+    except Exception as e:
+        print(f"❌ Error generating batch AI explanations: {e}")
+        return {}
 
 if __name__ == '__main__':
     print("🚀 Starting Forensic Gender Classifier API...")
@@ -260,6 +493,7 @@ if __name__ == '__main__':
     print("   GET  /api/health   - Health check")
     print("   GET  /api/features - Get feature list")
     print("   POST /api/predict  - Predict gender")
+    print("   POST /api/predict-batch - Predict gender for multiple cases")
     print("   GET  /api/sample   - Get sample data")
     print("="*50)
     
@@ -5,13 +5,21 @@ Team Metric Mind - VTU CSE Project
 
 Using 15 Mandibular Measurements (No Serial No./ID)
 Best Model: Logistic Regression with 75.00% accuracy
+
+Usage:
+    python forensic_classifier_fixed.py             # Train and save models
+    python forensic_classifier_fixed.py --ablation  # Feature-subset ablation study
 """
 
+import os
+import argparse
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.model_selection import train_test_split, cross_val_score
+from sklearn.model_selection import train_test_split, cross_val_score, cross_validate, StratifiedKFold
+from sklearn.feature_selection import SelectFromModel
+from sklearn.pipeline import make_pipeline
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.svm import SVC
@@ -20,9 +28,175 @@ from sklearn.tree import DecisionTreeClassifier
 from sklearn.neural_network import MLPClassifier
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix
 import joblib
+from joblib import Parallel, delayed
 import warnings
 warnings.filterwarnings('ignore')
 
+DATASET_PATH = 'Metric_Final.xlsx'
+FEATURE_CACHE_PATH = 'feature_matrix_15features.pkl'
+ABLATION_REPORT_PATH = 'ablation_report_15features.csv'
+
+# Bump whenever the drop, fill or encode steps in load_feature_matrix() change
+FEATURE_CACHE_VERSION = 1
+
+# The four measurements quoted in the backend's Gemini explanation prompt
+EXPLANATION_FEATURES = [
+    'M1 Length',
+    'M2 Bicondylar breadth',
+    'M3 Bigonial breadth',
+    'M9 Gonial angle'
+]
+
+def build_model_families():
+    """Fresh, unfitted instances of the five model families trained in main()"""
+    return {
+        'SVM': SVC(kernel='rbf', probability=True, random_state=42),
+        'Random Forest': RandomForestClassifier(n_estimators=100, random_state=42),
+        'Logistic Regression': LogisticRegression(max_iter=1000, random_state=42),
+        'Decision Tree': DecisionTreeClassifier(random_state=42),
+        'Neural Network': MLPClassifier(hidden_layer_sizes=(100, 50), max_iter=1000, random_state=42)
+    }
+
+def load_feature_matrix(dataset_path=DATASET_PATH, cache_path=FEATURE_CACHE_PATH):
+    """Load the median-imputed 15-feature matrix, reusing the on-disk cache when fresh"""
+    source_mtime = os.path.getmtime(dataset_path)
+    
+    if os.path.exists(cache_path):
+        try:
+            cached = joblib.load(cache_path)
+            if (cached['version'] == FEATURE_CACHE_VERSION
+                    and cached['source_mtime'] == source_mtime):
+                print(f"✓ Reusing cached feature matrix: {cache_path}")
+                return cached['X'], cached['y'], cached['label_encoder']
+            print(f"⚠️ Feature matrix cache is stale, rebuilding: {cache_path}")
+        except Exception as e:
+            # Truncated writes or pandas/scikit-learn upgrades can leave an unreadable cache
+            print(f"⚠️ Unreadable feature matrix cache, rebuilding: {e}")
+    
+    df = pd.read_excel(dataset_path)
+    X = df.drop(columns=['S. No.', 'ID No.', 'Gender'])
+    X = X.fillna(X.median())
+    
+    le = LabelEncoder()
+    y = le.fit_transform(df['Gender'])
+    
+    joblib.dump({
+        'version': FEATURE_CACHE_VERSION,
+        'source_mtime': source_mtime,
+        'X': X,
+        'y': y,
+        'label_encoder': le
+    }, cache_path)
+    print(f"✓ Feature matrix cached: {cache_path}")
+    return X, y, le
+
+def build_feature_subsets(columns):
+    """Candidate subsets as name -> (features, top_k); top_k subsets are picked per CV fold"""
+    columns = list(columns)
+    subsets = {'All 15 measurements': (columns, None)}
+    
+    explanation = [col for col in EXPLANATION_FEATURES if col in columns]
+    if explanation:
+        subsets[f'AI explanation ({len(explanation)})'] = (explanation, None)
+    
+    for k in range(1, len(columns)):
+        subsets[f'Top-{k} importance'] = (columns, k)
+    
+    for col in columns:
+        subsets[f'Without {col}'] = ([c for c in columns if c != col], None)
+    
+    return subsets
+
+def evaluate_subset(X, y, subset_name, features, top_k, model_name, model, cv):
+    """Cross-validate one model family on one feature subset"""
+    # Parallel workers don't inherit the module-level warnings filter
+    warnings.filterwarnings('ignore')
+    
+    # Scaling and top-k selection both live inside the pipeline, so each
+    # fold is scaled and ranked on its training rows only and the test rows stay unseen
+    steps = [StandardScaler()]
+    if top_k is not None:
+        ranker = RandomForestClassifier(n_estimators=200, random_state=42)
+        steps.append(SelectFromModel(ranker, max_features=top_k, threshold=-np.inf))
+    pipeline = make_pipeline(*steps, model)
+    
+    cv_results = cross_validate(pipeline, X[features].values, y, cv=cv,
+                                scoring='accuracy', return_estimator=True)
+    scores = cv_results['test_score']
+    
+    if top_k is None:
+        selected = ', '.join(features)
+    else:
+        # Report how often each measurement was picked across the folds
+        counts = pd.Series(0, index=features)
+        for estimator in cv_results['estimator']:
+            mask = estimator.named_steps['selectfrommodel'].get_support()
+            counts[np.array(features)[mask]] += 1
+        counts = counts[counts > 0].sort_values(ascending=False, kind='stable')
+        selected = ', '.join(f'{col} ({n}/{len(scores)})' for col, n in counts.items())
+    
+    return {
+        'Subset': subset_name,
+        'Size': top_k if top_k is not None else len(features),
+        'Model': model_name,
+        'Mean Accuracy': scores.mean(),
+        'Std': scores.std(),
+        'Features': selected
+    }
+
+def run_ablation(folds=5, n_jobs=-1, report_path=ABLATION_REPORT_PATH):
+    """Evaluate feature subsets for every model family and write a ranked report"""
+    print("="*80)
+    print("🧪 FEATURE-SUBSET ABLATION STUDY")
+    print("Team Metric Mind - VTU CSE Project")
+    print("="*80)
+    
+    # Step 1: Load cached feature matrix
+    print("\n📊 Step 1: Loading Feature Matrix...")
+    try:
+        X, y, le = load_feature_matrix()
+    except Exception as e:
+        print(f"❌ Error loading dataset: {e}")
+        return
+    print(f"✓ {X.shape[0]} samples × {X.shape[1]} measurements")
+    
+    # Step 2: Build candidate subsets
+    print("\n🔧 Step 2: Building Feature Subsets...")
+    subsets = build_feature_subsets(X.columns)
+    print(f"✓ {len(subsets)} subsets (top-k ranked by Random Forest importance within each training fold)")
+    
+    # Step 3: Cross-validate every (subset, model) pair in parallel
+    model_names = list(build_model_families())
+    print(f"\n🤖 Step 3: Running {len(subsets) * len(model_names)} "
+          f"{folds}-fold CV jobs (n_jobs={n_jobs})...")
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=42)
+    rows = Parallel(n_jobs=n_jobs)(
+        delayed(evaluate_subset)(X, y, subset_name, features, top_k, model_name, model, cv)
+        for subset_name, (features, top_k) in subsets.items()
+        for model_name, model in build_model_families().items()
+    )
+    print("✅ All CV jobs completed!")
+    
+    # Step 4: Rank and save report
+    print("\n📊 Step 4: Ranking Results...")
+    report = pd.DataFrame(rows).sort_values(
+        ['Mean Accuracy', 'Size'], ascending=[False, True]
+    ).reset_index(drop=True)
+    report.insert(0, 'Rank', range(1, len(report) + 1))
+    report.to_csv(report_path, index=False)
+    
+    print("\nTOP 10 SUBSETS:")
+    print(report.drop(columns=['Features']).head(10).to_string(index=False))
+    
+    print("\nBEST ACCURACY BY SUBSET SIZE:")
+    by_size = report.loc[report.groupby('Size')['Mean Accuracy'].idxmax()]
+    print(by_size[['Size', 'Subset', 'Model', 'Mean Accuracy', 'Std']].to_string(index=False))
+    
+    print("\n" + "="*80)
+    print(f"✅ Ablation report saved: {report_path}")
+    print("="*80)
+    return report
+
 def main():
     print("="*80)
     print("🧬 ML-BASED FORENSIC GENDER CLASSIFIER")
@@ -32,16 +206,18 @@ def main():
     # Step 1: Load dataset
     print("\n📊 Step 1: Loading Dataset...")
     try:
-        df = pd.read_excel('Metric_Final.xlsx')
+        # Shared with the ablation study so both runs train on the same cached matrix
+        X, y_encoded, le = load_feature_matrix()
         print(f"✅ Dataset loaded successfully!")
-        print(f"📊 Shape: {df.shape[0]} rows × {df.shape[1]} columns")
+        print(f"📊 Shape: {X.shape[0]} rows × {X.shape[1]} features")
         print(f"\n📋 First 5 rows:")
-        print(df.head())
+        print(X.head())
         
+        y = pd.Series(le.inverse_transform(y_encoded), name='Gender')
         print(f"\n🎯 Gender Distribution:")
-        print(df['Gender'].value_counts())
+        print(y.value_counts())
         print(f"\nPercentage:")
-        print(df['Gender'].value_counts(normalize=True) * 100)
+        print(y.value_counts(normalize=True) * 100)
         
     except Exception as e:
         print(f"❌ Error loading dataset: {e}")
@@ -50,24 +226,13 @@ def main():
     # Step 2: Data Preprocessing
     print("\n🔧 Step 2: Data Preprocessing...")
     
-    # Remove S. No. and ID No. - Use only 15 mandibular measurements
-    target_col = 'Gender'
-    exclude_cols = ['S. No.', 'ID No.', 'Gender']
-    X = df.drop(columns=exclude_cols)
-    y = df[target_col]
-    
+    # S. No. and ID No. are dropped in load_feature_matrix() - only 15 mandibular measurements remain
     print(f"✓ Total Features: {len(X.columns)}")
     print("\n15 Mandibular Measurements:")
     for i, col in enumerate(X.columns, 1):
         print(f"  {i:2d}. {col}")
     
-    # Handle missing values
-    X = X.fillna(X.median())
-    print(f"\n✓ Missing values handled")
-    
-    # Encode target
-    le = LabelEncoder()
-    y_encoded = le.fit_transform(y)
+    print(f"\n✓ Missing values handled (median imputation)")
     print(f"✓ Target encoded: {le.classes_} → {np.unique(y_encoded)}")
     
     # Step 3: Train-Test Split
@@ -246,4 +411,16 @@ def main():
     print("="*80)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='ML-Based Forensic Gender Classifier')
+    parser.add_argument('--ablation', action='store_true',
+                        help='Run the feature-subset ablation study instead of training')
+    parser.add_argument('--folds', type=int, default=5,
+                        help='Cross-validation folds for the ablation study')
+    parser.add_argument('--jobs', type=int, default=-1,
+                        help='Parallel workers for the ablation study (-1 = all cores)')
+    args = parser.parse_args()
+    
+    if args.ablation:
+        run_ablation(folds=args.folds, n_jobs=args.jobs)
+    else:
+        main()
\ No newline at end of file